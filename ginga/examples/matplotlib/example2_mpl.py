@@ -48,9 +48,7 @@ class FitsViewer(QtGui.QMainWindow):
         fi.set_callback('drag-drop', self.drop_file_cb)
         fi.set_callback('cursor-changed', self.cursor_cb)
         fi.set_bg(0.2, 0.2, 0.2)
-        fi.show_mode_indicator(True, corner='ur')
         fi.ui_set_active(True)
-        fi.show_mode_indicator(True, corner='ur')
         self.fitsimage = fi
         fi.set_figure(fig)
 
@@ -81,6 +79,8 @@ class FitsViewer(QtGui.QMainWindow):
         vbox.addWidget(w, stretch=1)
 
         self.readout = QtGui.QLabel("")
+        self._readout_pos = None
+        self._readout_pending = False
         vbox.addWidget(self.readout, stretch=0,
                        alignment=QtCore.Qt.AlignCenter)
 
@@ -205,6 +205,18 @@ class FitsViewer(QtGui.QMainWindow):
         """This gets called when the data position relative to the cursor
         changes.
         """
+        # Mouse motion can generate events faster than the screen can be
+        # updated, so just record the position and update the readout
+        # from a timer, at most ~60 times per second
+        self._readout_pos = (viewer, data_x, data_y)
+        if not self._readout_pending:
+            self._readout_pending = True
+            QtCore.QTimer.singleShot(16, self._do_readout)
+
+    def _do_readout(self):
+        self._readout_pending = False
+        viewer, data_x, data_y = self._readout_pos
+
         # Get the value under the data coordinates
         try:
             # We report the value across the pixel, even though the coords
@@ -234,6 +246,8 @@ class FitsViewer(QtGui.QMainWindow):
 
         text = "RA: %s  DEC: %s  X: %.2f  Y: %.2f  Value: %s" % (
             ra_txt, dec_txt, fits_x, fits_y, value)
+        # NOTE: the readout is a Qt label outside of the figure, so
+        # updating it does not cause a matplotlib redraw
         self.readout.setText(text)
 
     def set_mode_cb(self, mode, tf):
@@ -249,8 +249,9 @@ class ImageViewMpl(ImageView.ImageViewBase):
         # clear utility axis
         self.ax_util.cla()
 
-        # force an update of the figure
-        self.figure.canvas.draw()
+        # request an update of the figure; draw_idle() lets the GUI
+        # coalesce the many redraws caused by e.g. cursor motion into one
+        self.figure.canvas.draw_idle()
 
         # Set the axis limits
         # TODO: should we do this only for those who have autoaxis=True?
@@ -301,9 +302,9 @@ class ImageViewMpl(ImageView.ImageViewBase):
         return buf.getvalue()
 
     def update_widget(self):
-        # force an update of the figure
+        # request an update of the figure
         if self.figure is not None and self.figure.canvas is not None:
-            self.figure.canvas.draw()
+            self.figure.canvas.draw_idle()
         pass
 
     def set_cursor(self, cursor):
@@ -352,7 +352,8 @@ class Mosaic(GingaPlugin.LocalPlugin):
                                    bg_ref=bg_ref, trim_px=trim_px,
                                    merge=merge, allow_expand=allow_expand,
                                    expand_pad_deg=expand_pad_deg,
-                                   suppress_callback=True)
+                                   suppress_callback=True,
+                                   allow_promote=True)
 
         # Add description for ChangeHistory
         info = dict(time_modified=datetime.utcnow(),
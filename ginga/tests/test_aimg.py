@@ -1,4 +1,5 @@
 import numpy as np
+import pytest
 
 from astropy import nddata
 from astropy.io import fits
@@ -85,4 +86,70 @@ class TestAstroImage(object):
         hdu2 = self.image.as_hdu()
         assert isinstance(hdu2, fits.PrimaryHDU)
 
+    def test_save_as_file(self, tmp_path):
+        """Test that we can save an AstroImage to a FITS file.
+        """
+        hdu = self._get_hdu()
+        self.image.load_hdu(hdu)
+
+        path = str(tmp_path / 'test.fits')
+        self.image.save_as_file(path)
+        with fits.open(path) as fits_f:
+            np.testing.assert_array_equal(fits_f[0].data, hdu.data)
+            assert fits_f[0].header['CRVAL1'] == hdu.header['CRVAL1']
+
+        # existing file is only replaced if asked to
+        with pytest.raises(OSError):
+            self.image.save_as_file(path)
+        self.image.save_as_file(path, overwrite=True)
+
+    @pytest.mark.parametrize(('suffix', 'magic'),
+                             [('.fits.gz', b'\x1f\x8b'),
+                              ('.fits.bz2', b'BZ')])
+    def test_save_as_file_gzipped(self, tmp_path, suffix, magic):
+        """Test that a file is compressed according to its suffix.
+        """
+        hdu = self._get_hdu()
+        self.image.load_hdu(hdu)
+
+        path = str(tmp_path / ('test' + suffix))
+        self.image.save_as_file(path)
+        with open(path, 'rb') as in_f:
+            assert in_f.read(len(magic)) == magic
+        with fits.open(path) as fits_f:
+            np.testing.assert_array_equal(fits_f[0].data, hdu.data)
+
+    @pytest.mark.parametrize(('suffix', 'kwargs', 'dtype'),
+                             [('.fits.fz', {}, np.int32),
+                              ('.fits.fz', {}, np.float32),
+                              ('.fits', dict(compress='GZIP_1'), np.int32),
+                              ('.fits', dict(compress='GZIP_1',
+                                             quantize_level=0), np.float64)])
+    def test_save_as_file_compressed(self, tmp_path, suffix, kwargs, dtype):
+        """Test that we can save an AstroImage to a tile compressed file.
+        """
+        hdu = self._get_hdu()
+        hdu.data = (hdu.data + 0.123).astype(dtype)
+        self.image.load_hdu(hdu)
+
+        # also as a pathlib path
+        path = tmp_path / ('test' + suffix)
+        self.image.save_as_file(path, **kwargs)
+        with fits.open(path) as fits_f:
+            assert isinstance(fits_f[1], fits.CompImageHDU)
+            np.testing.assert_array_equal(fits_f[1].data, hdu.data)
+            assert fits_f[1].header['CRVAL1'] == hdu.header['CRVAL1']
+
+    def test_save_as_file_quantized(self, tmp_path):
+        """Test that floats are quantized if asked for lossy compression.
+        """
+        hdu = self._get_hdu()
+        hdu.data = hdu.data + np.random.random(hdu.data.shape)
+        self.image.load_hdu(hdu)
+
+        path = str(tmp_path / 'test.fits.fz')
+        self.image.save_as_file(path, compress='RICE_1')
+        with fits.open(path) as fits_f:
+            assert not np.array_equal(fits_f[1].data, hdu.data)
+
 # END
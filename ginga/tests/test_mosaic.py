@@ -0,0 +1,330 @@
+import io
+import os
+import gzip
+import tarfile
+
+import numpy as np
+import pytest
+
+from astropy.io import fits
+
+from ginga import AstroImage, trcalc
+from ginga.misc import log
+from ginga.util import wcs, mosaic, _mosaic_kernel
+from ginga.util.io import io_fits
+
+
+class TestMosaic(object):
+    def setup_class(self):
+        self.logger = log.get_logger("TestMosaic", null=True)
+        self.px_scale = 0.001
+
+    def _get_image(self, ra_deg, dec_deg, value, shape=(20, 20),
+                   dtype=np.float32):
+        ht, wd = shape
+        image = AstroImage.AstroImage(logger=self.logger)
+        image.load_data(np.full(shape, value, dtype=dtype))
+        kwds = wcs.simple_wcs(wd / 2.0, ht / 2.0, ra_deg, dec_deg,
+                              self.px_scale, 0.0)
+        image.update_keywords(kwds)
+        return image
+
+    def test_mosaic_fov(self):
+        """Test that pieces are dropped into a fixed size mosaic."""
+        images = [self._get_image(10.0, 0.0, 1.0),
+                  self._get_image(10.02, 0.0, 2.0),
+                  self._get_image(10.0, 0.02, 3.0)]
+        img_mosaic = mosaic.mosaic(self.logger, images, fov_deg=0.1)
+
+        data = img_mosaic.get_data()
+        assert data.shape == (100, 100)
+        for i, value in enumerate((1.0, 2.0, 3.0)):
+            # each piece is placed without overlap
+            assert np.count_nonzero(data == value) == images[i].width ** 2
+
+    def test_mosaic_fov_rotated(self):
+        """Test that a rotated piece within a fixed size mosaic is placed,
+        even though the rotation pads it beyond the mosaic bounds."""
+        image = AstroImage.AstroImage(logger=self.logger)
+        image.load_data(np.full((20, 20), 2.0, dtype=np.float32))
+        kwds = wcs.simple_wcs(10.0, 10.0, 10.03, 0.0, self.px_scale, 30.0)
+        image.update_keywords(kwds)
+        images = [self._get_image(10.0, 0.0, 1.0), image]
+        img_mosaic = mosaic.mosaic(self.logger, images, fov_deg=0.1)
+
+        data = img_mosaic.get_data()
+        assert data.shape == (100, 100)
+        assert np.count_nonzero(data == 1.0) == 400
+        assert np.count_nonzero(data == 2.0) > 350
+
+    def test_mosaic_fov_clip(self, tmp_path):
+        """Test that pieces straddling a fixed size mosaic are clipped to
+        it, whether they are given as images, files or buffers."""
+        images = [self._get_image(ra_deg, dec_deg, i + 1.0)
+                  for i, (ra_deg, dec_deg) in enumerate([(10.0, 0.0),
+                                                         (10.05, 0.0),
+                                                         (10.0, -0.055),
+                                                         (10.5, 0.0)])]
+        # rotated pieces are read in full
+        image = self._get_image(9.96, 0.05, 5.0)
+        image.update_keywords(wcs.simple_wcs(10.0, 10.0, 9.96, 0.05,
+                                             self.px_scale, 30.0))
+        images.append(image)
+        paths, buffers = [], []
+        for i, image in enumerate(images):
+            path = str(tmp_path / 'piece{}.fits'.format(i))
+            image.save_as_file(path)
+            paths.append(path)
+            with open(path, 'rb') as in_f:
+                buffers.append(in_f.read())
+
+        results = [mosaic.mosaic(self.logger, items, fov_deg=0.1).get_data()
+                   for items in (images, paths, buffers)]
+        for data in results:
+            assert data.shape == (100, 100)
+            assert 0 < np.count_nonzero(data == 2.0) < 400
+            assert 0 < np.count_nonzero(data == 3.0) < 400
+            assert np.count_nonzero(data == 4.0) == 0
+            assert 0 < np.count_nonzero(data == 5.0) < 400
+            np.testing.assert_array_equal(data, results[0])
+
+    def test_mosaic_expand(self):
+        """Test that the mosaic grows to fit pieces if no fov is given."""
+        images = [self._get_image(10.0, 0.0, 1.0),
+                  self._get_image(10.0, 0.03, 2.0)]
+        img_mosaic = mosaic.mosaic(self.logger, images)
+
+        data = img_mosaic.get_data()
+        assert data.shape[0] > 40
+        assert np.count_nonzero(data == 1.0) == 400
+        assert np.count_nonzero(data == 2.0) == 400
+
+    def test_mosaic_inline_wcs_cache(self):
+        """Test that identically oriented pieces share a cache entry."""
+        img_mosaic = mosaic.mosaic(self.logger,
+                                   [self._get_image(10.0, 0.0, 1.0)],
+                                   fov_deg=0.1)
+        mosaic._xy_rotation_and_scale.cache_clear()
+        images = [self._get_image(10.02, 0.0, 2.0),
+                  self._get_image(10.0, 0.02, 3.0)]
+        mosaic.mosaic_inline(img_mosaic, images)
+
+        # the mosaic and both pieces have the same orientation
+        info = mosaic._xy_rotation_and_scale.cache_info()
+        assert info.misses == 1
+        assert info.hits == 2
+        data = img_mosaic.get_data()
+        assert np.count_nonzero(data == 2.0) == 400
+        assert np.count_nonzero(data == 3.0) == 400
+
+    def _write_pieces(self, tmp_path):
+        paths = []
+        for i, (ra_deg, dec_deg) in enumerate([(10.0, 0.0), (10.02, 0.0),
+                                               (10.0, 0.02), (10.02, 0.02)]):
+            image = self._get_image(ra_deg, dec_deg, i + 1.0)
+            path = str(tmp_path / 'piece{}.fits'.format(i))
+            image.save_as_file(path)
+            paths.append(path)
+        return paths
+
+    @pytest.mark.parametrize('use_fitsio', [False, True])
+    def test_mosaic_files(self, tmp_path, use_fitsio):
+        """Test that pieces can be given as file paths."""
+        if use_fitsio and not io_fits.have_fitsio:
+            pytest.skip('fitsio not installed')
+        paths = self._write_pieces(tmp_path)
+
+        img_mosaic = mosaic.mosaic(self.logger, paths, fov_deg=0.1,
+                                   use_fitsio=use_fitsio)
+
+        data = img_mosaic.get_data()
+        for i in range(len(paths)):
+            assert np.count_nonzero(data == i + 1.0) == 400
+
+    @pytest.mark.parametrize('use_fitsio', [False, True])
+    # uint16 is saved as int16 with BZERO=32768
+    @pytest.mark.parametrize('dtype', [np.float32, np.uint16])
+    def test_mosaic_files_cutout(self, tmp_path, use_fitsio, dtype):
+        """Test that only the overlapping part of a file is used for a
+        fixed size mosaic."""
+        if use_fitsio and not io_fits.have_fitsio:
+            pytest.skip('fitsio not installed')
+        paths = []
+        for i, ra_deg in enumerate([10.0, 10.05, 10.5]):
+            image = self._get_image(ra_deg, 0.0, i + 1, dtype=dtype)
+            path = str(tmp_path / 'piece{}.fits'.format(i))
+            image.save_as_file(path)
+            paths.append(path)
+
+        img_mosaic = mosaic.mosaic(self.logger, paths, fov_deg=0.1,
+                                   use_fitsio=use_fitsio)
+
+        data = img_mosaic.get_data()
+        assert data.shape == (100, 100)
+        assert np.count_nonzero(data == 1.0) == 400
+        # straddles the edge of the mosaic
+        assert 0 < np.count_nonzero(data == 2.0) < 400
+        # completely outside of the mosaic
+        assert np.count_nonzero(data == 3.0) == 0
+
+    @pytest.mark.parametrize('merge', [False, True])
+    def test_mosaic_inline_overlap(self, merge):
+        """Test how overlapping pieces are combined."""
+        img_mosaic = mosaic.mosaic(self.logger,
+                                   [self._get_image(10.0, 0.0, 1.0)],
+                                   fov_deg=0.1)
+        # overlaps the first piece by half
+        image = self._get_image(10.01, 0.0, 2.0)
+        mosaic.mosaic_inline(img_mosaic, [image], merge=merge)
+
+        data = img_mosaic.get_data()
+        if merge:
+            assert np.count_nonzero(data == 3.0) == 200
+            assert np.count_nonzero(data == 1.0) == 200
+        else:
+            # existing pixels are not overwritten
+            assert np.count_nonzero(data == 1.0) == 400
+        assert np.count_nonzero(data == 2.0) == 200
+
+    @pytest.mark.parametrize(('rot_deg', 'cdbase', 'flip_x', 'flip_y'),
+                             [(0.0, [-1, 1], True, False),
+                              (180.0, [1, 1], True, True),
+                              (180.0, [-1, 1], False, True)])
+    def test_mosaic_inline_flip(self, rot_deg, cdbase, flip_x, flip_y):
+        """Test that pieces are flipped into the mosaic orientation."""
+        img_mosaic = mosaic.mosaic(self.logger,
+                                   [self._get_image(10.0, 0.0, 0.0)],
+                                   fov_deg=0.1)
+        image = AstroImage.AstroImage(logger=self.logger)
+        image.load_data(np.arange(1.0, 401.0).reshape(20, 20))
+        kwds = wcs.simple_wcs(10.0, 10.0, 10.0, 0.0, self.px_scale,
+                              rot_deg, cdbase=cdbase)
+        image.update_keywords(kwds)
+        mosaic.mosaic_inline(img_mosaic, [image])
+
+        data = img_mosaic.get_data()
+        ys, xs = np.nonzero(data)
+        piece = data[ys.min():ys.max() + 1, xs.min():xs.max() + 1]
+        expected = image.get_data()
+        if flip_x:
+            expected = expected[:, ::-1]
+        if flip_y:
+            expected = expected[::-1, :]
+        np.testing.assert_array_equal(piece, expected)
+
+    @pytest.mark.parametrize('rot_deg', [30.0, -73.2, 90.0])
+    @pytest.mark.parametrize('dtype', ['f8', '>f4', '>i2'])
+    def test_rotate_kernel(self, rot_deg, dtype):
+        """Test that the mosaic rotation kernel matches trcalc.rotate()."""
+        pytest.importorskip('numba')
+        data = np.random.default_rng(0).random((37, 51)) * 1000
+        data = data.astype(dtype)
+        for data_np in (data, data[::-1, 2:]):
+            np.testing.assert_array_equal(
+                _mosaic_kernel.rotate(data_np, rot_deg),
+                trcalc.rotate(data_np, rot_deg))
+
+    @pytest.mark.parametrize(('dtype', 'mosaic_dtype', 'result_dtype'),
+                             [(np.float64, None, np.float32),
+                              (np.int16, None, np.float32),
+                              (np.int16, np.int16, np.int16)])
+    def test_mosaic_dtype(self, dtype, mosaic_dtype, result_dtype):
+        """Test that the mosaic does not use a wider type than needed."""
+        images = [self._get_image(10.0, 0.0, 1, dtype=dtype),
+                  self._get_image(10.0, 0.03, 2, dtype=dtype)]
+        img_mosaic = mosaic.mosaic(self.logger, images, dtype=mosaic_dtype)
+
+        # also after the mosaic was expanded
+        data = img_mosaic.get_data()
+        assert data.shape[0] > 40
+        assert data.dtype == result_dtype
+        assert np.count_nonzero(data == 2) == 400
+
+    def test_mosaic_dtype_mixed(self):
+        """Test that pieces of different types are stored without loss."""
+        images = [self._get_image(10.0, 0.0, 1, dtype=np.int16),
+                  self._get_image(10.02, 0.0, 2.7, dtype=np.float64),
+                  self._get_image(10.0, 0.02, 2**24 + 1, dtype=np.int32)]
+        img_mosaic = mosaic.mosaic(self.logger, images, fov_deg=0.1)
+
+        # float32 does not hold all int32 values
+        data = img_mosaic.get_data()
+        assert data.dtype == np.float64
+        assert np.count_nonzero(data == np.float32(2.7)) == 400
+        assert np.count_nonzero(data == 2**24 + 1) == 400
+
+    @pytest.mark.parametrize(('value', 'dtype'),
+                             [(2.5, np.float32),
+                              (70000, np.int32),
+                              (40000, np.uint16)])
+    @pytest.mark.parametrize('merge', [False, True])
+    def test_mosaic_dtype_lossy(self, value, dtype, merge):
+        """Test that pieces that don't fit the mosaic type raise an error."""
+        img_mosaic = mosaic.mosaic(self.logger,
+                                   [self._get_image(10.0, 0.0, 1,
+                                                    dtype=np.int16)],
+                                   fov_deg=0.1, dtype=np.int16)
+        image = self._get_image(10.02, 0.0, value, dtype=dtype)
+        with pytest.raises(TypeError):
+            mosaic.mosaic_inline(img_mosaic, [image], merge=merge)
+        assert np.count_nonzero(img_mosaic.get_data() != 0) == 400
+
+    @pytest.mark.parametrize('use_fitsio', [False, True])
+    def test_mosaic_mef(self, tmp_path, use_fitsio):
+        """Test that the pieces can be the extensions of a single file."""
+        if use_fitsio and not io_fits.have_fitsio:
+            pytest.skip('fitsio not installed')
+        fits_f = fits.HDUList([fits.PrimaryHDU()])
+        for path in self._write_pieces(tmp_path):
+            with fits.open(path) as in_f:
+                fits_f.append(fits.ImageHDU(in_f[0].data, in_f[0].header))
+        path = str(tmp_path / 'mef.fits')
+        fits_f.writeto(path)
+
+        img_mosaic = mosaic.mosaic(self.logger, [path], fov_deg=0.1,
+                                   use_fitsio=use_fitsio)
+
+        data = img_mosaic.get_data()
+        for i in range(len(fits_f) - 1):
+            assert np.count_nonzero(data == i + 1.0) == 400
+
+    def test_mosaic_tar(self, tmp_path):
+        """Test that the pieces can be the FITS files in a tar archive."""
+        paths = self._write_pieces(tmp_path)
+        # also a compressed piece
+        with open(paths[-1], 'rb') as in_f:
+            with gzip.open(paths[-1] + '.gz', 'wb') as out_f:
+                out_f.write(in_f.read())
+        os.remove(paths[-1])
+        # and files that are not FITS files
+        readme_path = tmp_path / 'README'
+        readme_path.write_text('pieces of a mosaic')
+        other_path = tmp_path / 'notes.txt'
+        other_path.write_text('no pixels here')
+
+        path = str(tmp_path / 'pieces.tar')
+        with tarfile.open(path, 'w') as tar_f:
+            for piece_path in paths[:-1] + [paths[-1] + '.gz', readme_path,
+                                            other_path]:
+                tar_f.add(piece_path)
+
+        img_mosaic = mosaic.mosaic(self.logger, [path], fov_deg=0.1)
+
+        data = img_mosaic.get_data()
+        for i in range(len(paths)):
+            assert np.count_nonzero(data == i + 1.0) == 400
+
+    def test_mosaic_buffers(self, tmp_path):
+        """Test that the pieces can be FITS files in memory."""
+        bufs = []
+        for path in self._write_pieces(tmp_path):
+            with open(path, 'rb') as in_f:
+                bufs.append(in_f.read())
+        # mix of bytes and file-like objects
+        bufs[1] = io.BytesIO(bufs[1])
+
+        img_mosaic = mosaic.mosaic(self.logger, bufs, fov_deg=0.1)
+
+        data = img_mosaic.get_data()
+        for i in range(len(bufs)):
+            assert np.count_nonzero(data == i + 1.0) == 400
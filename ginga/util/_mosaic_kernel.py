@@ -0,0 +1,90 @@
+#
+# _mosaic_kernel.py -- compiled kernels for building mosaics
+#
+# This is open-source software licensed under a BSD license.
+# Please see the file LICENSE.txt for details.
+#
+"""
+Optional compiled kernels used by `ginga.util.mosaic`.
+
+If numba is installed, rotating a piece into the mosaic orientation is
+done by a JIT-compiled parallel loop, which avoids the full size
+coordinate arrays of the NumPy version.  Otherwise the NumPy version in
+`ginga.trcalc` is used.  Both give the same result.  8-bit data is always
+rotated by `ginga.trcalc`, which uses OpenCv or pillow for it.
+"""
+import math
+
+import numpy as np
+
+from ginga import trcalc
+
+have_numba = False
+try:
+    # optional numba package speeds up rotating mosaic pieces
+    import numba
+    have_numba = True
+
+except ImportError:
+    pass
+
+# For testing
+#have_numba = False
+
+__all__ = ['have_numba', 'rotate']
+
+
+if have_numba:
+    @numba.njit(parallel=True)
+    def _rotate(src, dst, cos_t, sin_t, ctr_x, ctr_y, off_x, off_y):
+        """Nearest neighbor rotation of `src` into `dst` about the
+        center (ctr_x, ctr_y) of `dst`.  (off_x, off_y) is the offset
+        of `src` within `dst`.  Pixels of `dst` that map outside of
+        `src` are left as is.
+        """
+        src_ht, src_wd = src.shape
+        dst_ht, dst_wd = dst.shape
+        for y in numba.prange(dst_ht):
+            yi = y - ctr_y
+            for x in range(dst_wd):
+                xi = x - ctr_x
+                # NOTE: same arithmetic as trcalc.rotate_clip(), so that
+                # the results are identical
+                ap = int(np.rint((xi * cos_t) - (yi * sin_t) + ctr_x)) - off_x
+                bp = int(np.rint((xi * sin_t) + (yi * cos_t) + ctr_y)) - off_y
+                if 0 <= ap < src_wd and 0 <= bp < src_ht:
+                    dst[y, x] = src[bp, ap]
+
+
+def rotate(data_np, theta_deg, pad=20, logger=None):
+    """Rotate 2D array `data_np` by `theta_deg` about its center, into
+    a new array that is large enough to hold the rotated data.
+
+    Same as `ginga.trcalc.rotate`, which is used if numba is not available
+    (or for 8-bit data).
+    """
+    if (not have_numba or len(data_np.shape) != 2 or
+            data_np.dtype == np.uint8):
+        return trcalc.rotate(data_np, theta_deg, pad=pad, logger=logger)
+
+    # If there is no rotation, then we are done
+    if math.fmod(theta_deg, 360.0) == 0.0:
+        return data_np
+
+    if logger is not None:
+        logger.debug("rotating with numba")
+    ht, wd = data_np.shape
+
+    # numba only handles native byte order (FITS data is big-endian)
+    data_np = data_np.astype(data_np.dtype.newbyteorder('='), copy=False)
+
+    # Make a square with room to rotate
+    side = int(math.sqrt(wd**2 + ht**2) + pad)
+    ctr = side // 2
+    newdata = np.zeros((side, side), dtype=data_np.dtype)
+
+    cos_t = float(np.cos(np.radians(theta_deg)))
+    sin_t = float(np.sin(np.radians(theta_deg)))
+    _rotate(data_np, newdata, cos_t, sin_t, ctr, ctr,
+            ctr - wd // 2, ctr - ht // 2)
+    return newdata
@@ -16,6 +16,7 @@ To force the use of one programmatically, do:
 (replace 'package' with one of {'astropy', 'fitsio'}) before you load
 any images.  Otherwise Ginga will try to pick one for you.
 """
+import os
 import re
 import numpy as np
 import warnings
@@ -44,6 +45,12 @@ except ImportError as e:
     have_fitsio = False
 
 
+# keywords that describe the structure of an HDU, rather than the data
+structural_keywords = ('SIMPLE', 'XTENSION', 'BITPIX', 'NAXIS', 'NAXIS1',
+                       'NAXIS2', 'NAXIS3', 'NAXIS4', 'EXTEND', 'PCOUNT',
+                       'GCOUNT')
+
+
 class FITSError(Exception):
     pass
 
@@ -519,21 +526,63 @@ class AstropyFitsFileHandler(BaseFitsFileHandler):
 
         return dstobj
 
-    def create_fits(self, data, header):
+    def create_fits(self, data, header, compress=None, quantize_level=None):
         fits_f = pyfits.HDUList()
         hdu = pyfits.PrimaryHDU()
-        hdu.data = data
+        if compress is None:
+            hdu.data = data
+        else:
+            # tile compressed image has to go in an extension
+            fits_f.append(hdu)
+            kwargs = {}
+            if quantize_level is not None:
+                kwargs['quantize_level'] = quantize_level
+            hdu = pyfits.CompImageHDU(data=data, compression_type=compress,
+                                      **kwargs)
 
         for kwd in header.keys():
+            if compress is not None and kwd in structural_keywords:
+                continue
             card = header.get_card(kwd)
             hdu.header[card.key] = (card.value, card.comment)
 
         fits_f.append(hdu)
         return fits_f
 
-    def write_fits(self, path, data, header, **kwargs):
-        fits_f = self.create_fits(data, header)
-        fits_f.writeto(path, **kwargs)
+    def write_fits(self, path, data, header, overwrite=False, compress=None,
+                   quantize_level=None, **kwargs):
+        """Write `data` and `header` to a FITS file at `path`.
+
+        If `compress` names a tile compression algorithm (e.g. 'RICE_1',
+        'GZIP_1', 'HCOMPRESS_1') the image is written tile compressed,
+        as fpack would do.  Note that floating point data is then
+        quantized, which is lossy, unless `quantize_level` is 0 (which
+        is lossless with 'GZIP_1' and 'GZIP_2' only).
+
+        For a path ending in '.fz' the default is 'RICE_1' for integer
+        data, and lossless 'GZIP_2' for floating point data.
+        """
+        path = os.fspath(path)
+        if compress is None and path.endswith('.fz'):
+            if issubclass(data.dtype.type, np.floating):
+                compress = 'GZIP_2'
+                if quantize_level is None:
+                    quantize_level = 0
+            else:
+                compress = 'RICE_1'
+        if not overwrite and os.path.exists(path):
+            raise OSError("File '%s' already exists" % (path))
+
+        fits_f = self.create_fits(data, header, compress=compress,
+                                  quantize_level=quantize_level)
+        if path.endswith(('.gz', '.bz2', '.zip')):
+            # let astropy compress the file according to its name
+            fits_f.writeto(path, overwrite=overwrite, **kwargs)
+        else:
+            # Write through a large buffer; astropy's many small writes
+            # are very slow on some network file systems
+            with open(path, 'wb', buffering=1 << 20) as out_f:
+                fits_f.writeto(out_f, **kwargs)
         fits_f.close()
 
     def save_as_file(self, filepath, data, header, **kwargs):
@@ -684,7 +733,8 @@ class FitsioFileHandler(BaseFitsFileHandler):
         filepath = info.filepath
 
         self.logger.debug("Loading file '%s' ..." % (filepath))
-        fits_f = fitsio.FITS(filepath, memmap=memmap)
+        # NOTE: fitsio does not support memory mapping
+        fits_f = fitsio.FITS(filepath)
         self.fits_f = fits_f
 
         extver_db = {}
@@ -741,13 +791,19 @@ class FitsioFileHandler(BaseFitsFileHandler):
 
             if not hasattr(hdu, 'read'):
                 continue
-            data = hdu.read()
 
-            if not isinstance(data, np.ndarray):
-                # We need to open a numpy array
-                continue
+            if hduinfo.get('hdutype', None) == fitsio.IMAGE_HDU:
+                # check image dimensions without reading in the data
+                shape = hduinfo.get('dims', [])
+            else:
+                data = hdu.read()
+
+                if not isinstance(data, np.ndarray):
+                    # We need to open a numpy array
+                    continue
+                shape = data.shape
 
-            if 0 in data.shape:
+            if 0 in shape:
                 # non-pixel or zero-length data hdu?
                 continue
 
@@ -4,14 +4,21 @@
 # This is open-source software licensed under a BSD license.
 # Please see the file LICENSE.txt for details.
 #
+import io
+import gzip
 import math
+import functools
 import time
+import tarfile
+import itertools
 import warnings
+from collections import namedtuple, deque
+from concurrent.futures import ThreadPoolExecutor
 
 import numpy as np
 
 from ginga import AstroImage, trcalc
-from ginga.util import wcs, loader, dp, iqcalc
+from ginga.util import wcs, loader, dp, iqcalc, iohelper, _mosaic_kernel
 from ginga.util.io import io_fits
 from ginga.misc import Callback, Settings
 
@@ -153,17 +160,74 @@ def warp_image(data_in, wcs_in, wcs_out, fill=None, pixel_radius=1):
     return (data_out, old_pts, coords, new_pts, out_pts)
 
 
+# number of pixels in the blocks in which pieces are written to the mosaic
+_block_size = 256 * 256
+
+# suffixes of the FITS files that are read from tar archives
+_fits_suffixes = ('.fits', '.fit', '.fts', '.fits.gz', '.fit.gz', '.fts.gz')
+
+# keywords that determine the rotation and scale of an image
+_WCSKey = namedtuple('_WCSKey', ['cd1_1', 'cd1_2', 'cd2_1', 'cd2_2',
+                                 'pc1_1', 'pc1_2', 'pc2_1', 'pc2_2',
+                                 'cdelt1', 'cdelt2', 'crota1', 'crota2'])
+
+
+def _get_wcs_key(image):
+    """Get the `_WCSKey` of `image`.  This is computed from the header
+    only once for images that were loaded by `mosaic`.
+    """
+    key = image.get('_wcskey', None)
+    if key is None:
+        header = image.get_header()
+        key = _WCSKey._make(header.get(kwd.upper(), None)
+                            for kwd in _WCSKey._fields)
+    return key
+
+
+@functools.lru_cache(maxsize=1024)
+def _xy_rotation_and_scale(key):
+    header = {kwd.upper(): value for kwd, value in zip(key._fields, key)
+              if value is not None}
+    return wcs.get_xy_rotation_and_scale(header)
+
+
+def _get_xy_rotation_and_scale(image):
+    """Like `~ginga.util.wcs.get_xy_rotation_and_scale`, but memoizes the
+    result by the `_WCSKey` of ``image``.  Identically oriented images
+    (e.g. all the pieces of a mosaic, and the mosaic itself) share a
+    single entry.
+    """
+    return _xy_rotation_and_scale(_get_wcs_key(image))
+
+
+def _can_store(src_dtype, dst_dtype):
+    """Whether values of `src_dtype` can be stored as `dst_dtype` without
+    loss; narrowing floating point values is accepted.
+    """
+    return (np.can_cast(src_dtype, dst_dtype, casting='safe') or
+            (src_dtype.kind == 'f' and dst_dtype.kind == 'f'))
+
+
 def mosaic_inline(baseimage, imagelist, bg_ref=None, trim_px=None,
                   merge=False, allow_expand=True, expand_pad_deg=0.01,
                   max_expand_pct=None,
-                  update_minmax=True, suppress_callback=False):
+                  update_minmax=True, suppress_callback=False,
+                  allow_promote=False, allow_clip=False):
     """Drops new images into the image `baseimage` (if there is room),
     relocating them according the WCS between the two images.
+
+    If a piece does not fit on `baseimage`, it is expanded if
+    `allow_expand` is True.  Otherwise, if `allow_clip` is True, only the
+    part of the piece that fits is used; if not, an error is raised.
+
+    Pieces must be storable in the data type of `baseimage` without loss
+    (other than narrowing floating point values, e.g. float64 to float32).
+    Otherwise, if `allow_promote` is True, the data of `baseimage` is
+    converted to a type that can hold both; if not, TypeError is raised.
     """
     # Get our own (mosaic) rotation and scale
-    header = baseimage.get_header()
     ((xrot_ref, yrot_ref),
-     (cdelt1_ref, cdelt2_ref)) = wcs.get_xy_rotation_and_scale(header)
+     (cdelt1_ref, cdelt2_ref)) = _get_xy_rotation_and_scale(baseimage)
 
     scale_x, scale_y = math.fabs(cdelt1_ref), math.fabs(cdelt2_ref)
 
@@ -209,9 +273,8 @@ def mosaic_inline(baseimage, imagelist, bg_ref=None, trim_px=None,
             baseimage.minval = min(baseimage.minval, minval)
 
         # Get rotation and scale of piece
-        header = image.get_header()
         ((xrot, yrot),
-         (cdelt1, cdelt2)) = wcs.get_xy_rotation_and_scale(header)
+         (cdelt1, cdelt2)) = _get_xy_rotation_and_scale(image)
         baseimage.logger.debug("image(%s) xrot=%f yrot=%f cdelt1=%f "
                                "cdelt2=%f" % (name, xrot, yrot, cdelt1, cdelt2))
 
@@ -232,33 +295,33 @@ def mosaic_inline(baseimage, imagelist, bg_ref=None, trim_px=None,
 
         flip_x = False
         flip_y = False
+        rotdata = data_np
 
-        # Optomization for 180 rotations
+        # Optomization for 180 rotations: same as flipping both axes
         if (np.isclose(math.fabs(rot_dx), 180.0) or
             np.isclose(math.fabs(rot_dy), 180.0)):
-            rotdata = trcalc.transform(data_np,
-                                       flip_x=True, flip_y=True)
+            flip_x = flip_y = True
             rot_dx = 0.0
             rot_dy = 0.0
-        else:
-            rotdata = data_np
 
         # Finish with any necessary rotation of piece
         if not np.isclose(rot_dy, 0.0):
             rot_deg = rot_dy
             baseimage.logger.debug("rotating %s by %f deg" % (name, rot_deg))
-            rotdata = trcalc.rotate(rotdata, rot_deg,
-                                    #rotctr_x=ctr_x, rotctr_y=ctr_y
-                                    logger=baseimage.logger)
+            rotdata = _mosaic_kernel.rotate(rotdata, rot_deg,
+                                            logger=baseimage.logger)
 
         # Flip X due to negative CDELT1
         if np.sign(cdelt1) != np.sign(cdelt1_ref):
-            flip_x = True
+            flip_x = not flip_x
 
         # Flip Y due to negative CDELT2
         if np.sign(cdelt2) != np.sign(cdelt2_ref):
-            flip_y = True
+            flip_y = not flip_y
 
+        # NOTE: flips are done as a single strided view of the piece,
+        # without a copy; the data is only traversed once, when it is
+        # written into the mosaic below
         if flip_x or flip_y:
             rotdata = trcalc.transform(rotdata,
                                        flip_x=flip_x, flip_y=flip_y)
@@ -290,7 +353,32 @@ def mosaic_inline(baseimage, imagelist, bg_ref=None, trim_px=None,
         assert (yhi - ylo == ht), \
             Exception("Height differential %d != %d" % (yhi - ylo, ht))
 
+        if not _can_store(rotdata.dtype, mydata.dtype):
+            if not allow_promote:
+                raise TypeError("Cannot store %s piece '%s' in %s mosaic "
+                                "without loss" % (rotdata.dtype, name,
+                                                  mydata.dtype))
+            new_dtype = np.result_type(mydata.dtype, rotdata.dtype)
+            baseimage.logger.debug("promoting mosaic from %s to %s" % (
+                mydata.dtype, new_dtype))
+            mydata = mydata.astype(new_dtype)
+            baseimage._data = mydata
+
         mywd, myht = baseimage.get_size()
+        if ((xlo < 0 or xhi > mywd or ylo < 0 or yhi > myht) and
+                allow_clip and not allow_expand):
+            # drop the parts of the piece that don't fit
+            cx0, cy0 = max(-xlo, 0), max(-ylo, 0)
+            cx1, cy1 = wd - max(xhi - mywd, 0), ht - max(yhi - myht, 0)
+            if cx0 >= cx1 or cy0 >= cy1:
+                baseimage.logger.info("Skipping image '%s'; it does not "
+                                      "overlap the mosaic" % (name))
+                continue
+            rotdata = rotdata[cy0:cy1, cx0:cx1, ...]
+            ht, wd = rotdata.shape[:2]
+            xlo, ylo = xlo + cx0, ylo + cy0
+            xhi, yhi = xlo + wd, ylo + ht
+
         if xlo < 0 or xhi > mywd or ylo < 0 or yhi > myht:
             if not allow_expand:
                 raise Exception("New piece doesn't fit on image and "
@@ -330,7 +418,7 @@ def mosaic_inline(baseimage, imagelist, bg_ref=None, trim_px=None,
                                 (expand_pct * 100, max_expand_pct))
 
             # go for it!
-            new_data = np.zeros((new_ht, new_wd))
+            new_data = np.zeros((new_ht, new_wd), dtype=mydata.dtype)
             # place current data into new data
             new_data[ny1_off:ny1_off + myht, nx1_off:nx1_off + mywd] = \
                 mydata
@@ -347,12 +435,21 @@ def mosaic_inline(baseimage, imagelist, bg_ref=None, trim_px=None,
 
         # fit image piece into our array
         try:
+            dst = mydata[ylo:yhi, xlo:xhi, ...]
+            src = rotdata[0:ht, 0:wd, ...]
             if merge:
-                mydata[ylo:yhi, xlo:xhi, ...] += rotdata[0:ht, 0:wd, ...]
+                dst += src
             else:
-                idx = (mydata[ylo:yhi, xlo:xhi, ...] == 0.0)
-                mydata[ylo:yhi, xlo:xhi, ...][idx] = \
-                    rotdata[0:ht, 0:wd, ...][idx]
+                # Fill only empty pixels; copyto() writes in place without
+                # the temporary arrays that boolean fancy indexing creates.
+                # Work in bands of rows of about _block_size pixels, so
+                # that the mask of empty pixels is still in the cache when
+                # it is used.  Full rows keep the memory access contiguous.
+                rows = max(1, _block_size // wd)
+                for y in range(0, ht, rows):
+                    _dst = dst[y:y + rows, ...]
+                    np.copyto(_dst, src[y:y + rows, ...],
+                              where=(_dst == 0.0), casting='same_kind')
 
         except Exception as e:
             baseimage.logger.error("Error fitting tile: %s" % (str(e)))
@@ -372,25 +469,284 @@ def mosaic_inline(baseimage, imagelist, bg_ref=None, trim_px=None,
     return res
 
 
-def mosaic(logger, itemlist, fov_deg=None):
+def _load_image(item, logger, use_fitsio=False):
+    """Return `item` if it is already an AstroImage.  If it is bytes-like
+    or a file-like object, it is parsed in memory as a FITS file (e.g.
+    for data fetched from an object store).  Otherwise treat it as a file
+    path and load it.
+
+    If `use_fitsio` is True and the fitsio package is installed, FITS
+    files are loaded with fitsio, which decompresses tile compressed
+    images faster than astropy.
+    """
+    if isinstance(item, AstroImage.AstroImage):
+        return item
+
+    if (isinstance(item, (bytes, bytearray, memoryview)) or
+            hasattr(item, 'read')):
+        return _load_fits_buffer(item, logger)
+
+    logger.info("Reading file '%s' ..." % (item))
+    image = None
+    if use_fitsio and io_fits.have_fitsio:
+        info = iohelper.get_fileinfo(item)
+        if iohelper.guess_filetype(info.filepath) == ('image', 'fits'):
+            opener = io_fits.get_fitsloader(kind='fitsio', logger=logger)
+            image = opener.load_file(item, numhdu=info.numhdu)
+
+    if image is None:
+        image = loader.load_data(item, logger=logger)
+
+    # parse the header for the WCS key here, while we are in a loader
+    # thread, instead of for each call to mosaic_inline()
+    image.set(_wcskey=_get_wcs_key(image))
+    return image
+
+
+def _get_hdu_shape(opener, hdu):
+    """Get the shape of image HDU `hdu` in the file opened by `opener`,
+    without reading its data.  Returns an empty tuple for a HDU that is
+    not an image or has no pixels.
+    """
+    if opener.get_hdu_type(hdu) != 'image':
+        return ()
+    if opener.kind == 'fitsio':
+        return tuple(hdu.get_info()['dims'])
+    return hdu.shape
+
+
+def _load_fits_buffer(buf, logger, name=None):
+    """Load the first 2D image in the FITS file contained in `buf`, by
+    parsing it in memory.  `buf` can be bytes-like or a file-like object
+    (e.g. `io.BytesIO`).  If `name` is given, the image is named that.
+    """
+    if not hasattr(buf, 'read'):
+        buf = io.BytesIO(buf)
+
+    opener = io_fits.get_fitsloader(kind='astropy', logger=logger)
+    with io_fits.pyfits.open(buf, 'readonly') as fits_f:
+        for hdu in fits_f:
+            if len(_get_hdu_shape(opener, hdu)) == 2:
+                image = opener.load_hdu(hdu, fobj=fits_f)
+                break
+        else:
+            raise ValueError("No 2D image found in FITS buffer")
+
+    if name is not None:
+        image.set(name=name)
+    image.set(_wcskey=_get_wcs_key(image))
+    return image
+
+
+def _load_aggregate(filepath, logger, use_fitsio=False):
+    """Load all the pieces from an aggregate of images in one pass.
+
+    If `filepath` is a tar archive, each FITS file in it is read and
+    parsed in memory.  Otherwise `filepath` is taken to be a (multi-
+    extension) FITS file and each of its 2D image HDUs is loaded,
+    without opening the file again.
+
+    Returns a list of AstroImage objects, or `None` if `filepath` does
+    not contain multiple images.
+    """
+    if filepath.lower().endswith(('.tar', '.tar.gz', '.tgz')):
+        logger.info("Reading archive '%s' ..." % (filepath))
+        images = []
+        with tarfile.open(filepath, 'r') as tar_f:
+            for member in tar_f:
+                # NOTE: pick members by name only; the members are not on
+                # disk, so there is nothing to identify them by content
+                if (member.isfile() and
+                        member.name.lower().endswith(_fits_suffixes)):
+                    buf = tar_f.extractfile(member).read()
+                    if member.name.lower().endswith('.gz'):
+                        buf = gzip.decompress(buf)
+                    images.append(_load_fits_buffer(buf, logger,
+                                                    name=member.name))
+        return images
+
+    info = iohelper.get_fileinfo(filepath)
+    if (info.numhdu is not None or
+            iohelper.guess_filetype(info.filepath) != ('image', 'fits')):
+        return None
+
+    kind = 'fitsio' if (use_fitsio and io_fits.have_fitsio) else 'astropy'
+    opener = io_fits.get_fitsloader(kind=kind, logger=logger)
+    with opener.open_file(info.filepath, memmap=True):
+        idxs = [idx for idx in range(len(opener))
+                if len(_get_hdu_shape(opener, opener.fits_f[idx])) == 2]
+        if len(idxs) < 2:
+            return None
+
+        logger.info("Reading %d extensions of '%s' ..." % (len(idxs),
+                                                           filepath))
+        images = []
+        for idx in idxs:
+            image = opener.load_idx(idx)
+            image.set(_wcskey=_get_wcs_key(image))
+            images.append(image)
+
+    return images
+
+
+def _is_placed_as_is(rot_scale, rot_scale_ref):
+    """Whether `mosaic_inline` places a piece with rotation and scale
+    `rot_scale` (as returned by `_get_xy_rotation_and_scale`) into a
+    mosaic with `rot_scale_ref` pixel for pixel, i.e. without scaling,
+    rotating or flipping it.
+    """
+    ((xrot, yrot), (cdelt1, cdelt2)) = rot_scale
+    ((xrot_ref, yrot_ref), (cdelt1_ref, cdelt2_ref)) = rot_scale_ref
+    return (np.isclose(cdelt1, cdelt1_ref) and
+            np.isclose(cdelt2, cdelt2_ref) and
+            np.isclose(xrot - xrot_ref, 0.0) and
+            np.isclose(yrot - yrot_ref, 0.0))
+
+
+def _load_cutout(item, corners, rot_scale_ref, logger, use_fitsio=False):
+    """Like `_load_image`, but for a FITS file only reads the part of the
+    image that overlaps a mosaic whose corners are given as the Nx2 array
+    of sky coordinates `corners`, and whose rotation and scale are
+    `rot_scale_ref`.
+
+    The overlap is calculated from the header alone, and then just that
+    section of the pixels is read from the file.  Returns `None` if the
+    image does not overlap the mosaic.
+    """
+    if not isinstance(item, str):
+        return _load_image(item, logger, use_fitsio=use_fitsio)
+
+    info = iohelper.get_fileinfo(item)
+    if (info.numhdu is not None or
+            iohelper.guess_filetype(info.filepath) != ('image', 'fits')):
+        return _load_image(item, logger, use_fitsio=use_fitsio)
+
+    kind = 'fitsio' if (use_fitsio and io_fits.have_fitsio) else 'astropy'
+    opener = io_fits.get_fitsloader(kind=kind, logger=logger)
+
+    logger.info("Reading header of file '%s' ..." % (item))
+    # NOTE: not memory mapped, as astropy refuses to memory map scaled
+    # (BZERO/BSCALE/BLANK) data; a section still only reads its rows
+    with opener.open_file(info.filepath, memmap=False):
+        # find the first HDU with pixels, without reading them
+        shape = ()
+        for idx in range(len(opener)):
+            hdu = opener.fits_f[idx]
+            shape = _get_hdu_shape(opener, hdu)
+            if len(shape) > 0:
+                break
+
+        if len(shape) != 2 or 0 in shape:
+            # not a simple 2D image--let the regular loader deal with it
+            return _load_image(item, logger, use_fitsio=use_fitsio)
+
+        image = AstroImage.AstroImage(logger=logger)
+        header = image.get_header()
+        opener.copy_header(hdu, header)
+        image.wcs.load_header(header)
+
+        if not _is_placed_as_is(_get_xy_rotation_and_scale(image),
+                                rot_scale_ref):
+            # a section would not be transformed exactly like the part
+            # of the whole image that ends up in the mosaic
+            return _load_image(item, logger, use_fitsio=use_fitsio)
+
+        # Locate the mosaic corners in this image to get the bounds of
+        # the section of pixels that fall within the mosaic, with a pixel
+        # to spare; mosaic_inline() clips the piece to the mosaic exactly
+        ht, wd = shape
+        pts = image.wcs.wcspt_to_datapt(corners)
+        (x_lo, y_lo), (x_hi, y_hi) = pts.min(axis=0), pts.max(axis=0)
+        x0 = max(int(np.floor(x_lo)), 0)
+        y0 = max(int(np.floor(y_lo)), 0)
+        x1 = min(int(np.ceil(x_hi)) + 1, wd)
+        y1 = min(int(np.ceil(y_hi)) + 1, ht)
+        if x0 >= x1 or y0 >= y1:
+            logger.info("Skipping '%s'; it does not overlap the mosaic" % (
+                item))
+            return None
+
+        logger.debug("Reading section x=%d:%d y=%d:%d of '%s'" % (
+            x0, x1, y0, y1, item))
+        if opener.kind == 'fitsio':
+            data = hdu[y0:y1, x0:x1]
+        elif hasattr(hdu, 'section'):
+            data = hdu.section[y0:y1, x0:x1]
+        else:
+            # older astropy has no section for compressed HDUs
+            data = hdu.data[y0:y1, x0:x1]
+
+    image.setup_data(data)
+    # correct reference pixel for the offset of the section
+    crpix1, crpix2 = image.get_keywords_list('CRPIX1', 'CRPIX2')
+    image.update_keywords(dict(CRPIX1=crpix1 - x0, CRPIX2=crpix2 - y0,
+                               NAXIS1=x1 - x0, NAXIS2=y1 - y0))
+    image.set(name=info.name, path=info.filepath,
+              _wcskey=_get_wcs_key(image))
+    return image
+
+
+def _prefetch(pool, load_fn, items, num_ahead):
+    """Generator that yields ``load_fn(item)`` for each item in `items`,
+    in order, while keeping up to `num_ahead` loads running in the thread
+    pool `pool`.
+
+    Only a bounded number of loaded pieces are held at any time, and each
+    is released as soon as the consumer is done with it.
+    """
+    items = iter(items)
+    pending = deque(pool.submit(load_fn, item)
+                    for item in itertools.islice(items, num_ahead))
+    try:
+        while len(pending) > 0:
+            future = pending.popleft()
+            for item in itertools.islice(items, 1):
+                pending.append(pool.submit(load_fn, item))
+            yield future.result()
+    finally:
+        # don't bother loading the rest if the consumer stopped early
+        for future in pending:
+            future.cancel()
+
+
+def mosaic(logger, itemlist, fov_deg=None, max_load_threads=8,
+           use_fitsio=True, dtype=None):
     """
     Parameters
     ----------
     logger : logger object
         a logger object passed to created AstroImage instances
     itemlist : sequence like
-        a sequence of either filenames or AstroImage instances
+        a sequence of either filenames, AstroImage instances or in-memory
+        FITS files (bytes or file-like objects such as `io.BytesIO`)
+    fov_deg : float or tuple of float (optional, defaults to `None`)
+        field of view of the mosaic; the parts of pieces that lie outside
+        of it are dropped (and not read at all, for files).  If `None`,
+        the mosaic starts out the size of the first image and is expanded
+        to fit the others.
+    max_load_threads : int (optional, defaults to 8)
+        maximum number of threads used to load files concurrently
+    use_fitsio : bool (optional, defaults to True)
+        load FITS files with fitsio, if it is installed; otherwise files
+        are loaded with the default loader (astropy for FITS files)
+    dtype : numpy dtype (optional, defaults to `None`)
+        data type of the mosaic; if `None`, float32 is used, which is
+        promoted to a wider type if needed to store the pieces without
+        loss (e.g. float64 for int32 pieces).  Otherwise, pieces that
+        cannot be stored in this type without loss (e.g. float pieces in
+        an integer mosaic) raise TypeError
+
+    If `itemlist` names just a multi-extension FITS file, or a tar archive
+    of FITS files, the pieces are all of the images in that file.
     """
+    if len(itemlist) == 1 and isinstance(itemlist[0], str):
+        images = _load_aggregate(itemlist[0], logger, use_fitsio=use_fitsio)
+        if images is not None:
+            if len(images) == 0:
+                raise ValueError("No images found in '%s'" % (itemlist[0]))
+            itemlist = images
 
-    if isinstance(itemlist[0], AstroImage.AstroImage):
-        image0 = itemlist[0]
-        name = image0.get('name', 'image0')
-    else:
-        # Assume it is a file and load it
-        filepath = itemlist[0]
-        logger.info("Reading file '%s' ..." % (filepath))
-        image0 = loader.load_data(filepath, logger=logger)
-        name = filepath
+    image0 = _load_image(itemlist[0], logger, use_fitsio=use_fitsio)
 
     ra_deg, dec_deg = image0.get_keywords_list('CRVAL1', 'CRVAL2')
     header = image0.get_header()
@@ -401,39 +757,64 @@ def mosaic(logger, itemlist, fov_deg=None):
     px_scale = math.fabs(cdelt1)
     expand = False
     if fov_deg is None:
-        # TODO: calculate fov?
+        wd, ht = image0.get_size()
+        fov_deg = (wd * px_scale, ht * math.fabs(cdelt2))
         expand = True
 
+    allow_promote = dtype is None
+    if dtype is None:
+        # there is no need for double precision pixel values; the type of
+        # the other pieces is not known yet, so don't assume an integer type
+        dtype = np.float32
+
     cdbase = [np.sign(cdelt1), np.sign(cdelt2)]
     img_mosaic = dp.create_blank_image(ra_deg, dec_deg,
                                        fov_deg, px_scale, rot_deg,
-                                       cdbase=cdbase,
+                                       cdbase=cdbase, dtype=dtype,
                                        logger=logger)
     header = img_mosaic.get_header()
     (rot, cdelt1, cdelt2) = wcs.get_rotation_and_scale(header)
     logger.debug("mosaic rot=%f cdelt1=%f cdelt2=%f" % (rot, cdelt1, cdelt2))
 
-    logger.debug("Processing '%s' ..." % (name))
-    tup = mosaic_inline(img_mosaic, [image0], allow_expand=expand)
+    # Load the rest of the pieces in a thread pool, so that file I/O
+    # overlaps with inlining the pieces already loaded.  The pieces are
+    # consumed in the order given, so the result is deterministic.
+    items = itemlist[1:]
+    num_files = len([item for item in items
+                     if not isinstance(item, AstroImage.AstroImage)])
+    num_threads = max(1, min(max_load_threads, num_files))
+
+    if expand:
+        load_fn = functools.partial(_load_image, logger=logger,
+                                    use_fitsio=use_fitsio)
+    else:
+        # the mosaic bounds are fixed, so only read the sections of
+        # the files that fall within the mosaic
+        wd, ht = img_mosaic.get_size()
+        corners = img_mosaic.wcs.datapt_to_wcspt(
+            [(0, 0), (wd - 1, 0), (0, ht - 1), (wd - 1, ht - 1)])
+        rot_scale = _get_xy_rotation_and_scale(img_mosaic)
+        load_fn = functools.partial(_load_cutout, corners=corners,
+                                    rot_scale_ref=rot_scale,
+                                    logger=logger, use_fitsio=use_fitsio)
+
+    with ThreadPoolExecutor(max_workers=num_threads) as pool:
+        loads = _prefetch(pool, load_fn, items, 2 * num_threads)
+        images = itertools.chain([image0], loads)
+        # skip pieces that don't overlap a fixed size mosaic
+        images = (image for image in images if image is not None)
+
+        logger.debug("Inlining %d images ..." % (len(itemlist)))
+        try:
+            # a fixed size mosaic is not expanded; pieces (including the
+            # padding of rotated ones) are clipped to it instead
+            tup = mosaic_inline(img_mosaic, images, allow_expand=expand,
+                                allow_clip=not expand,
+                                allow_promote=allow_promote)
+        finally:
+            loads.close()
     logger.debug("placement %s" % (str(tup)))
 
-    count = 1
-    for item in itemlist[1:]:
-        if isinstance(item, AstroImage.AstroImage):
-            image = item
-        else:
-            # Create and load the image
-            filepath = item
-            logger.info("Reading file '%s' ..." % (filepath))
-            image = io_fits.load_file(filepath, logger=logger)
-
-        name = image.get('name', 'image%d' % (count))
-
-        logger.debug("Inlining '%s' ..." % (name))
-        tup = mosaic_inline(img_mosaic, [image])
-        logger.debug("placement %s" % (str(tup)))
-        count += 1
-
     logger.info("Done.")
     return img_mosaic
 